@@ -6,6 +6,14 @@ http://www.gurobi.com/documentation/7.0/refman/py_python_api_overview.html.
 """
 import csv
 import json
+import os
+import shutil
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
 
 try:
     import gurobipy as gp
@@ -13,6 +21,12 @@ except ImportError:
     raise ImportError("gurobipy not installed. Please see {0} to download".format(
         "https://www.gurobi.com/documentation/6.5/quickstart_mac/the_gurobi_python_interfac.html"))
 
+# orjson is optional, it is used for faster json output when installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # Assuming that constraints are of the form: 
 # constraintName(index1,index2,...,indexN).
@@ -38,6 +52,35 @@ CON_ATTRS = ["Sense", "RHS", "ConstrName", "Pi", "Slack",
              "CBasis", "DStart", "Lazy", "IISConstr", 
              "SARHSLow", "SARHSUp", "FarkasDual"]
 
+# Buffer size used for file exports, large enough that big
+# csv exports are written in a few large chunks.
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Lower-cased attribute names for case-insensitive membership checks
+_VAR_ATTRS_LOWER = frozenset(a.lower() for a in VAR_ATTRS)
+_CON_ATTRS_LOWER = frozenset(a.lower() for a in CON_ATTRS)
+
+
+# Name of the user data attribute that holds pygurobi's cached data on
+# a model, so the cache lives and dies with the model. It maps each of
+# the keys below to the model size the data was built for and the data.
+_MODEL_CACHE_ATTR = "_pygurobi_cache"
+
+# Cache keys: the list of all variables or constraints, a dictionary
+# mapping set names to lists of variables or constraints, and a
+# dictionary mapping id() of a variable or constraint to the object
+# and its parsed index values.
+_VAR_LIST_CACHE = "var_list"
+_CON_LIST_CACHE = "con_list"
+_VAR_SET_INDEX = "var_sets"
+_CON_SET_INDEX = "con_sets"
+_VAR_INDICES_CACHE = "var_indices"
+_CON_INDICES_CACHE = "con_indices"
+
+# Cache key of a rename made through pygurobi that Gurobi may not have
+# applied yet: the name attribute, a renamed object and its new name.
+_PENDING_RENAME = "pending_rename"
+
 
 def read_model(filename):
     """
@@ -56,10 +99,95 @@ def reoptimize(m):
     """
     
     m.update()
+    clear_cache(m)
     m.reset()
     m.optimize()
 
 
+def _get_model_cached(key, model, size, build):
+    """
+    Return the cached data stored under key on model, calling build
+    to (re)create it when missing or built for a different size.
+    """
+
+    cache = getattr(model, _MODEL_CACHE_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(model, _MODEL_CACHE_ATTR, cache)
+
+    pending = cache.get(_PENDING_RENAME)
+    if pending is not None:
+        attr, obj, name = pending
+        if model.getAttr(attr, [obj])[0] != name:
+            # Gurobi still reports the old names until the model is
+            # updated, so nothing built now may be kept.
+            return build()
+        cache.clear()
+
+    entry = cache.get(key)
+    if entry is None or entry[0] != size:
+        entry = (size, build())
+        cache[key] = entry
+
+    return entry[1]
+
+
+def clear_cache(model):
+    """
+    Drop all cached variable and constraint data for model.
+
+    Lookups cache the variables, constraints and their names
+    of a model and only refresh them when the number of variables
+    or constraints changes. Call this after model.update() when
+    variables or constraints were renamed, or removed and added,
+    directly through gurobipy or without passing the model.
+    """
+
+    cache = getattr(model, _MODEL_CACHE_ATTR, None)
+    if cache is not None:
+        cache.clear()
+
+
+def _mark_renamed(model, attr, objects, name):
+    """
+    Drop the cached data of model after objects were renamed,
+    and stop caching until Gurobi reports the new name.
+    """
+
+    cache = getattr(model, _MODEL_CACHE_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(model, _MODEL_CACHE_ATTR, cache)
+
+    cache.clear()
+    if objects:
+        cache[_PENDING_RENAME] = (attr, objects[-1], name)
+
+
+def _get_model_variables(model):
+    """
+    Return a list of all variables in the model.
+
+    The model is only queried again when its number of variables changes
+    or clear_cache is called.
+    """
+
+    return list(_get_model_cached(_VAR_LIST_CACHE, model, model.NumVars,
+                                  model.getVars))
+
+
+def _get_model_constraints(model):
+    """
+    Return a list of all constraints in the model.
+
+    The model is only queried again when its number of constraints changes
+    or clear_cache is called.
+    """
+
+    return list(_get_model_cached(_CON_LIST_CACHE, model, model.NumConstrs,
+                                  model.getConstrs))
+
+
 def get_variable_attrs():
     """
     Return a list of variable attributes.
@@ -94,25 +222,16 @@ def list_constraints(model):
     sharing the same string identifier before the indices:
     A(2,3,4) and A(1,2,3) are in the same constraint set, A;
     A(2,3,4) and B(2,3,4) are in constraint sets A and B, respectively
+
+    Set names are cached; call clear_cache after model.update()
+    when constraints were renamed directly through gurobipy.
     """
 
-    sets = {}
-    constraints = model.getConstrs()
-    
-    # Assuming constraint set name separated from indicies by
-    for c in constraints:
-        name = c.constrName
-        split_name = name.split(CON_BRACKET_L)
-        set_name = split_name[0]
-
-        if set_name not in sets:
-            sets[set_name] = 1
-        else:
-            sets[set_name] += 1
-    
-    print "Constraint set, Number of constraints"
-    print "\n".join(["{0}, {1}".format(name, number) for name, number
-                            in sorted(sets.items())])
+    sets = {set_name: len(constraints) for set_name, constraints
+            in _get_constraint_set_index(model).items()}
+
+    print("Constraint set, Number of constraints")
+    _print_pairs(sorted(sets.items(), key=itemgetter(0)))
 
 
 def list_variables(model):
@@ -125,28 +244,27 @@ def list_variables(model):
     sharing the same string identifier before the indices:
     A[2,3,4] and A[1,2,3] are in the same variable set, A;
     A[2,3,4] and B[2,3,4] are in variable sets A and B, respectively
+
+    Set names are cached; call clear_cache after model.update()
+    when variables were renamed directly through gurobipy.
     """
 
-    sets = {}
-    variables = model.getVars()
-    
-    # Assuming constraint set name separated from indicies by
-    for v in variables:
-        name = v.varName
-        split_name = name.split(VAR_BRACKET_L)
-        set_name = split_name[0]
-
-        if set_name not in sets:
-            sets[set_name] = 1
-        else:
-            sets[set_name] += 1
-    
-    print "Variable set, Number of variables"
-    print "\n".join(["{0}, {1}".format(name, number) for name, number
-                            in sorted(sets.items())])
+    sets = {set_name: len(variables) for set_name, variables
+            in _get_variable_set_index(model).items()}
+
+    print("Variable set, Number of variables")
+    _print_pairs(sorted(sets.items(), key=itemgetter(0)))
+
+
+def _print_pairs(pairs):
+    """
+    Print to screen each key, value pair on its own line.
+    """
+
+    sys.stdout.writelines(f"{key}, {value}\n" for key, value in pairs)
 
 
-def get_variables(model, name="", approx=False, filter_values={}, exclude=False):
+def get_variables(model, name=None, approx=False, filter_values=None, exclude=False):
     """
     Return a list of variables from the model
     selected by variable set name.
@@ -163,37 +281,98 @@ def get_variables(model, name="", approx=False, filter_values={}, exclude=False)
     See the source code for more details.
     """
 
-    variables = []
     if not name:
-        variables = model.getVars()
-    
-    if not approx:
-        variables = [v for v in model.getVars() 
-                if v.varName.split(VAR_BRACKET_L)[0] == name]
+        variables = _get_model_variables(model)
     else:
-        variables = [v for v in model.getVars()
-                if name in v.varName.split(VAR_BRACKET_L)[0]]
+        variables = _get_set_members(_get_variable_set_index(model),
+                                     name, approx)
 
     if filter_values:
         variables = filter_variables(variables, filter_values,
-                exclude=exclude)
+                exclude=exclude, model=model)
 
     return variables
 
 
+def _get_set_members(sets, name, approx=False):
+    """
+    Return a list of the variables or constraints of the sets
+    matching name in a dictionary of set names to members.
+
+    With approx, members of every set whose name contains name are
+    returned, set by set in the model order of each set's first
+    member. Only the set names are scanned.
+    """
+
+    return _get_sets_members(sets, [name], approx)
+
+
+def _get_sets_members(sets, names_list, approx=False):
+    """
+    Return a list of the variables or constraints of the sets
+    matching each name in names_list, in the order of names_list.
+    """
+
+    members = []
+
+    if not approx:
+        for name in names_list:
+            members.extend(sets.get(name, ()))
+        return members
+
+    # The sets were filled in model order, so they keep the model
+    # order of their first members.
+    for name in names_list:
+        for set_name, set_members in sets.items():
+            if name in set_name:
+                members.extend(set_members)
+
+    return members
+
+
+def _get_variable_set_index(model):
+    """
+    Return a dictionary mapping the variable set names of a model
+    to lists of their variables.
+
+    The dictionary is built once and rebuilt only when the
+    number of variables in the model changes or clear_cache is called.
+    """
+
+    def build():
+        variables = _get_model_variables(model)
+        names = _get_attr_values("VarName", variables, model)
+
+        # The names are at hand, so fill the model's index cache too
+        parsed = _get_model_cached(_VAR_INDICES_CACHE, model, model.NumVars,
+                                   dict)
+        sets = defaultdict(list)
+        for v, var_name in zip(variables, names):
+            sets[var_name.partition(VAR_BRACKET_L)[0]].append(v)
+            parsed[id(v)] = (v, _parse_variable_indices(var_name))
+        return dict(sets)
+
+    return _get_model_cached(_VAR_SET_INDEX, model, model.NumVars, build)
+
+
+def get_variables_multiple(model, names_list, approx=False):
+    """
+    Return a list of variables given by the variable
+    set names in names_list.
+    """
+
+    return _get_sets_members(_get_variable_set_index(model), names_list,
+                             approx)
+
+
 def check_attr(attr, attributes):
     """
     Check if the attr string case-insensitively corresponds to a
     Gurobi attribute.
     """
-    for a in attributes:
 
-        if attr == a:
-            return True
-        if attr.lower() == a.lower():
-            return True
-
-    return False
+    attr = attr.lower()
+    return any(attr == a.lower() for a in attributes)
 
 
 def check_variable_attr(attr):
@@ -203,9 +382,7 @@ def check_variable_attr(attr):
     Case-insensitive.
     """
 
-    var_attrs = get_variable_attrs()
-
-    return check_attr(attr, var_attrs)
+    return attr.lower() in _VAR_ATTRS_LOWER
 
 
 def check_constraint_attr(attr):
@@ -215,12 +392,58 @@ def check_constraint_attr(attr):
     Attributes are case-insensitive.
     """
 
-    con_attrs = get_constraint_attrs()
+    return attr.lower() in _CON_ATTRS_LOWER
+
+
+def _check_attr_given(attr, check, kind):
+    """
+    Raise an AttributeError if attr is missing or is not
+    a Gurobi attribute of the given kind, "variable" or "constraint".
+    """
+
+    if not attr:
+        raise AttributeError("No attributes specified")
+
+    if not check(attr):
+        raise AttributeError(
+            f"Attribute: {attr} not a {kind} attribute.\n"
+            f"Get list of all {kind} attributes with the\n"
+            f"get_{kind}_attrs() method.")
+
+
+def _get_attr_values(attr, objects, model=None):
+    """
+    Return a list of attribute values for the given
+    variables or constraints.
+
+    Values are fetched from the model in a single call when a model
+    is available, otherwise from each object in turn.
+    """
+
+    if model is not None:
+        return model.getAttr(attr, list(objects))
 
-    return check_attr(attr, con_attrs)
+    return [getattr(o, attr) for o in objects]
 
 
-def get_variables_attr(attr, model="", name="", variables=""):
+def _set_attr_values(attr, objects, values, model=None):
+    """
+    Set an attribute of the given variables or constraints
+    to the corresponding entries of values.
+
+    Values are set on the model in a single call when a model
+    is available, otherwise on each object in turn.
+    """
+
+    if model is not None:
+        model.setAttr(attr, list(objects), list(values))
+        return
+
+    for o, value in zip(objects, values):
+        setattr(o, attr, value)
+
+
+def get_variables_attr(attr, model=None, name=None, variables=None):
     """
     Return a dictionary of variables names and their
     corresponding attribute value. 
@@ -229,66 +452,62 @@ def get_variables_attr(attr, model="", name="", variables=""):
     
     """
 
-    if not attr:
-        raise AttributeError("No attributes specified")
-    
-    if not check_variable_attr(attr):
-        raise AttributeError("{0}\n{1}\n{2}".format(
-        "Attribute: {0} not a variable attribute.".format(attr),
-        "Get list of all variables attributes with the",
-        "get_variable_attrs() method."))
+    _check_attr_given(attr, check_variable_attr, "variable")
     
     # Make a list of attributes at the top and check against
     # them to make sure that the specified attribute belongs.
 
-    if not model and not variables:
+    if model is None and variables is None:
         raise ValueError("No model or variable list given")
 
     variables = variables_check(model, name, variables)
 
-    return {v.varName: getattr(v, attr) for v in variables}
+    names = _get_attr_values("VarName", variables, model)
+    values = _get_attr_values(attr, variables, model)
+
+    return dict(zip(names, values))
 
 
-def print_variables_attr(attr, model="", name="", variables=""):
+def print_variables_attr(attr, model=None, name=None, variables=None,
+                         sort=True):
     """
     Print to screen a dictionary of variables names and their
     corresponding attribute value. 
 
     Specifiy either model and name parameters or supply a list of variables
-    
+
+    Set sort to False to skip sorting by variable name.
     """
 
     var_dict = get_variables_attr(attr, model=model,
                                  name=name, variables=variables)
 
-
-    print "\n".join(["{0}, {1}".format(v, k) for v, k in 
-                    sorted(var_dict.items())])
+    print_dict(var_dict, sort=sort)
 
 
-def set_variables_attr(attr, val, model="", name="", variables=""):
+def set_variables_attr(attr, val, model=None, name=None, variables=None):
     """
     Set an attribute of a model variable set.
 
-    Specifiy either model and name parameters or supply a list of variables
+    Specifiy either model and name parameters or supply a list of variables.
+    When renaming a list of variables without the model, call
+    clear_cache(model) after model.update().
     """
-    if not attr or not val:
+    if val is None:
         raise AttributeError("No attribute or value specified")
-        return
-    
-    if not check_variable_attr(attr):
-        raise AttributeError("{0}\n{1}\n{2}".format(
-        "Attribute: {0} not a variable attribute.".format(attr),
-        "Get list of all variables attributes with the",
-        "get_variable_attrs() method."))
 
-    if not model and not variables:
+    _check_attr_given(attr, check_variable_attr, "variable")
+
+    if model is None and variables is None:
         raise ValueError("No model or variables specified")
     
     variables = variables_check(model, name, variables)
 
-    for v in variables:
-        setattr(v, attr, val)
+    _set_attr_values(attr, variables, [val]*len(variables), model)
+
+    if attr.lower() == "varname" and model is not None:
+        # Cached set indices and index values are built from the names
+        _mark_renamed(model, attr, variables, val)
 
 
 def zero_all_objective_coeffs(model):
@@ -296,46 +515,49 @@ def zero_all_objective_coeffs(model):
     Set all objective coefficients in a model to zero.
     """
 
-    if not model:
+    if model is None:
         raise ValueError("No model given")
     
-    for v in model.getVars():
-        v.Obj = 0
+    variables = _get_model_variables(model)
+    _set_attr_values("Obj", variables, [0.0]*len(variables), model)
 
 
-def set_variables_bounds(lb="", ub="", model="", name="", variables=""):
+def set_variables_bounds(lb=None, ub=None, model=None, name=None, variables=None):
     """
     Set the lower bound and/or upper bound for a variables set.
 
     Specifiy either model and name parameters or supply a list of variables
     """
 
-    if lb:
-        set_variables_attr("lb", val=lb, model=model, 
-                          name=name, variables=variables)
+    if lb is None and ub is None:
+        return
+
+    # Look the variables up once for both bounds
+    variables = variables_check(model, name, variables)
 
-    if ub:
-        set_variables_attr("ub", val=ub, model=model, 
-                          name=name, variables=variables)
+    if lb is not None:
+        set_variables_attr("lb", val=lb, model=model, variables=variables)
 
+    if ub is not None:
+        set_variables_attr("ub", val=ub, model=model, variables=variables)
 
-def remove_variables_from_model(model, name="", variables=""):
+
+def remove_variables_from_model(model, name=None, variables=None):
     """
     Remove the given variables from the model.
 
-    Specifiy either model and name parameters or supply a list of constraints
+    Specifiy either model and name parameters or supply a list of variables
     """
 
-    if not model and not variables:
-        raise ValueError("No model or variables given")
-
-    if not model:
+    if model is None:
         raise ValueError("No model given")
 
     variables = variables_check(model, name, variables)
 
-    for v in variables:
-        model.remove(v)
+    clear_cache(model)
+
+    # A single call removes the whole list
+    model.remove(list(variables))
 
 
 def variables_check(model, name, variables):
@@ -344,19 +566,18 @@ def variables_check(model, name, variables):
     variables based on the information supplied.
     """
 
-    if variables:
+    if variables is not None:
+        if not isinstance(variables, list):
+            variables = list(variables)
         return variables
 
-    if model and name:
-        variables = get_variables(model, name)
-    if model and not name:
-        variables = model.getVars()
-    
-    if not variables:
-        print "No variables found for\nmodel: {0},\nname: {1}".format(
-               model, name)
+    if model is None:
+        raise ValueError("No model or variables given")
 
-    return variables
+    if name:
+        return get_variables(model, name)
+
+    return _get_model_variables(model)
     
     
 def get_variable_index_value(variable, index):
@@ -368,21 +589,73 @@ def get_variable_index_value(variable, index):
     as A[a,c,d, ....,f]
     """
 
-    value = variable.varName.split(",")[index].strip()
-    if VAR_BRACKET_R in value:
-        value = value[:-1]
-    elif VAR_BRACKET_L in value:
-        value = value.split(VAR_BRACKET_L)[1]
-    
-    # Not expecting many variable index values to
+    return _parse_variable_indices(variable.varName)[index]
+
+
+def _get_variables_indices(variables, model=None):
+    """
+    Return a list of the index value tuples of the given variables.
+
+    Without a model every name is read and parsed. With a model the
+    names not parsed yet are fetched in a single call and the tuples
+    are cached with the model's other cached data.
+    """
+
+    if model is None:
+        return [_parse_variable_indices(v.varName) for v in variables]
+
+    # Each entry keeps its variable alive, so an id() can not be
+    # reused by another variable while the entry exists.
+    parsed = _get_model_cached(_VAR_INDICES_CACHE, model, model.NumVars,
+                               dict)
+    missing = [v for v in variables
+               if parsed.get(id(v), (None,))[0] is not v]
+    if missing:
+        names = _get_attr_values("VarName", missing, model)
+        for v, var_name in zip(missing, names):
+            parsed[id(v)] = (v, _parse_variable_indices(var_name))
+
+    return [parsed[id(v)][1] for v in variables]
+
+
+def _parse_variable_indices(name):
+    """
+    Return a tuple of the index values in a variable name.
+    """
+
+    return _parse_indices(name, VAR_BRACKET_L, VAR_BRACKET_R)
+
+
+def _parse_indices(name, bracket_l, bracket_r):
+    """
+    Return a tuple of the index values found between
+    the given brackets in a variable or constraint name.
+    """
+
+    _, bracket, indices = name.partition(bracket_l)
+    if bracket:
+        head, bracket, _ = indices.rpartition(bracket_r)
+        if bracket:
+            indices = head
+    else:
+        indices = name
+
+    # A list comprehension is noticeably faster than
+    # feeding a generator to tuple()
+    return tuple([_coerce_index_value(value.strip())
+                  for value in indices.split(",")])
+
+
+def _coerce_index_value(value):
+    """
+    Return value as an int if it is an integer literal,
+    otherwise return the string unchanged.
+    """
+
+    # Not expecting many index values to
     # to be floats
-    if value.isdigit:
-        try: 
-            value = int(value)
-        except ValueError:
-            pass
-            
-    return value
+    digits = value[1:] if value[:1] == "-" else value
+    return int(value) if digits.isdecimal() else value
 
 
 def get_linexp_from_variables(variables):
@@ -392,44 +665,87 @@ def get_linexp_from_variables(variables):
     
     """
     
-    linexp = gp.LinExpr()
-    for v in variables:
-        linexp += v
+    variables = list(variables)
 
-    return linexp
+    return gp.LinExpr([1.0]*len(variables), variables)
 
 
-def sum_variables_by_index(index, model="", name="", variables=""):
+def sum_variables_by_index(index, model=None, name=None, variables=None):
     """
     Return a dictionary mapping index values to the sum
-    of the solution values of all matching variables.
+    of the solution values of all matching variables,
+    ordered by index value.
 
     Specifiy either model and name parameters or supply a list of variables
     """
 
-    var_dict = get_variables_by_index(index, model=model, name=name,
-                                      variables=variables)
-    if not var_dict:
-        raise ValueError("No variables found".format(index))
+    variables, indices = _index_variables_check(index, model, name,
+                                                variables)
+    if not variables:
+        raise ValueError("No variables found")
 
-    new_dict = {index_name: sum([v.X for v in index_vars])
-                for index_name, index_vars in 
-                sorted(var_dict.items())}
+    values = _get_attr_values("X", variables, model)
 
-    return new_dict
+    # Group and sum in a single pass rather than building
+    # lists of variables for each index value first.
+    new_dict = {}
+    for v_indices, x in zip(indices, values):
+        index_value = v_indices[index]
+        new_dict[index_value] = new_dict.get(index_value, 0) + x
+
+    # Only the index values are sorted, usually far fewer than variables
+    return dict(sorted(new_dict.items(), key=itemgetter(0)))
+
+
+def sum_variables_by_index_mvar(mvar, index):
+    """
+    Return a dictionary mapping positions along the given index
+    of a Gurobi MVar to the sum of the matching solution values.
+
+    This is the fast path for variables created with Model.addMVar
+    (Gurobi 9 and later): the solution is read as one numpy array
+    and summed over all other dimensions without parsing names.
+    """
+
+    values = mvar.X
+    if not -values.ndim <= index < values.ndim:
+        raise IndexError(f"Index {index} out of range for an MVar "
+                         f"with {values.ndim} dimensions")
+
+    # Negative indices count from the last dimension, as for names
+    index %= values.ndim
+    axes = tuple(axis for axis in range(values.ndim) if axis != index)
+
+    return dict(enumerate(values.sum(axis=axes).tolist()))
+
+
+def _is_mvar(variables):
+    """
+    Check if variables is a Gurobi MVar.
+
+    Always False for Gurobi versions without the matrix API.
+    """
 
+    mvar_type = getattr(gp, "MVar", None)
 
-def print_dict(dictionary):
+    return mvar_type is not None and isinstance(variables, mvar_type)
+
+
+def print_dict(dictionary, sort=True):
     """
     Print a dictionary to screen.
+
+    Set sort to False to print in the dictionary's own order.
     """
 
-    print "\n".join(["{0}, {1}".format(index_name, index_value)
-                     for index_name, index_value in 
-                     sorted(dictionary.items())])
-                     
-                     
-def print_variables_sum_by_index(index, model="", name="", variables=""):
+    items = dictionary.items()
+    if sort:
+        items = sorted(items, key=itemgetter(0))
+
+    _print_pairs(items)
+
+
+def print_variables_sum_by_index(index, model=None, name=None, variables=None):
     """
     Print a dictionary of variables, summed by index.
     """
@@ -439,7 +755,7 @@ def print_variables_sum_by_index(index, model="", name="", variables=""):
     print_dict(var_dict)
 
 
-def get_variables_by_index(index, model="", name="", variables=""):
+def get_variables_by_index(index, model=None, name=None, variables=None):
     """
     Return a dictionary mapping index values to lists of
     matching variables.
@@ -448,35 +764,44 @@ def get_variables_by_index(index, model="", name="", variables=""):
     
     """
 
+    variables, indices = _index_variables_check(index, model, name,
+                                                variables)
+
+    var_dict = defaultdict(list)
+    for v, v_indices in zip(variables, indices):
+        var_dict[v_indices[index]].append(v)
+
+    return dict(var_dict)
+
+
+def _index_variables_check(index, model, name, variables):
+    """
+    Check the arguments of the by-index functions and return
+    the variables to group and a list of their index value tuples.
+    """
+
     if index != 0 and not index:
         raise IndexError("No index given")
     
-    if not model and not variables:
+    if model is None and variables is None:
         raise ValueError("No model or variables given")
     
-    if not (name and model) and not variables:
+    if not (name and model is not None) and variables is None:
         raise ValueError("No variables specified")
 
     variables = variables_check(model, name, variables)
 
-    var_dict = {}
-
-    for v in variables:
-
-        value = get_variable_index_value(v, index)
-        if value not in var_dict:
-            var_dict[value] = [v]
-        else:
-            var_dict[value].append(v)
+    return variables, _get_variables_indices(variables, model)
 
-    return var_dict
 
-
-def filter_variables(variables, filter_values, exclude=False):
+def filter_variables(variables, filter_values, exclude=False, model=None):
     """
     Return a new list of variables that match the filter values 
     from the given variables list.
-    
+
+    filter_values maps index numbers to the index values to match.
+    If a model is given, unparsed variable names are fetched from it
+    in a single call.
     """
 
     if not variables:
@@ -485,31 +810,48 @@ def filter_variables(variables, filter_values, exclude=False):
     if not filter_values:
         raise ValueError("Dictionary of filter values not given")
 
-    new_vars = []
-    for v in variables:
-        add = True
-        for index, value in filter_values.iteritems():
-            key = get_variable_index_value(v, index)
-            if key != value:
-                add = False
-                break
-        if add:
-            new_vars.append(v)
+    get_values, match = _index_matcher(filter_values)
+    indices = _get_variables_indices(variables, model)
 
-    if exclude:
-        new_vars = [v for v in (set(variables)-set(new_vars))]
+    # Single pass over the variables, keeping those whose match
+    # result differs from exclude.
+    new_vars = [v for v, v_indices in zip(variables, indices)
+                if (get_values(v_indices) == match) != exclude]
 
     return new_vars
         
 
+def _index_matcher(filter_values):
+    """
+    Return a function picking the filtered positions out of an
+    index tuple, and the value it returns for a matching tuple.
+
+    All filters are then checked with a single comparison.
+    """
+
+    positions = list(filter_values)
+    get_values = itemgetter(*positions)
+    if len(positions) == 1:
+        return get_values, filter_values[positions[0]]
+
+    return get_values, tuple(filter_values[p] for p in positions)
+
+
 def get_variables_by_index_values(model, name, index_values, exclude=False):
-    
-    variables = get_variables(model, name, index_values, exclude)
+    """
+    Return a list of variables filtered by index values.
+
+    If exlude is False then return variables that match the filters.
+    If exclude is True than return variables that do not match the filters.
+    """
+
+    variables = get_variables(model, name, filter_values=index_values,
+                              exclude=exclude)
     
     return variables
     
     
-def get_variables_by_two_indices(index1, index2, model="", name="", variables=""):
+def get_variables_by_two_indices(index1, index2, model=None, name=None, variables=None):
     """
     Return a dictionary of variables mapping index1 values
     to dictionaries mapping
@@ -518,40 +860,56 @@ def get_variables_by_two_indices(index1, index2, model="", name="", variables=""
     Specifiy either model and name parameters or supply a list of variables
     """
     
+    if index2 != 0 and not index2:
+        raise IndexError("No index given")
+
+    variables, indices = _index_variables_check(index1, model, name,
+                                                variables)
+
+    # Group by both indices in one pass over the variables
     two_indices_dict = {}
-    index1_dict = get_variables_by_index(index1, model=model, name=name,
-                                      variables=variables)
-    for key, value in index1_dict.iteritems():
-        two_indices_dict[key] = get_variables_by_index(index2, variables=value)
-        
+    for v, v_indices in zip(variables, indices):
+        index_dict = two_indices_dict.setdefault(v_indices[index1], {})
+        index_dict.setdefault(v_indices[index2], []).append(v)
+
     return two_indices_dict
 
 
-def print_variables(variables):
+def print_variables(variables, model=None):
     """
     Print a list of variables to look good.
+
+    If a model is given the names are fetched from it in a single call.
     """
 
-    print "\n".join([v.varName for v in variables])
+    names = _get_attr_values("VarName", variables, model)
+    sys.stdout.writelines(name + "\n" for name in names)
     
     
-def sum_variables_by_two_indices(index1, index2, model="", name="", variables=""):
+def sum_variables_by_two_indices(index1, index2, model=None, name=None, variables=None):
     """
     Return a dictionary mapping index1 values
     to dictionaries of the given variables summed over index2.
     
     """
 
-    two_indices_dict = get_variables_by_two_indices(index1, index2,
-                                        model=model, name=name, variables=variables)
-    if not two_indices_dict:
+    if index2 != 0 and not index2:
+        raise IndexError("No index given")
+
+    variables, indices = _index_variables_check(index1, model, name,
+                                                variables)
+    if not variables:
         raise ValueError("Inputs did not match with model variables")
-        
+
+    values = _get_attr_values("X", variables, model)
+
+    # Sum the bulk-fetched solution values into
+    # both levels of the dictionary in one pass.
     new_dict = {}
-    for key, var_dict in two_indices_dict.iteritems():
-        new_dict[key] = {index_name: sum([v.X for v in index_vars])
-                for index_name, index_vars in 
-                sorted(var_dict.items())}
+    for v_indices, x in zip(indices, values):
+        index_sums = new_dict.setdefault(v_indices[index1], {})
+        index_sums[v_indices[index2]] = (index_sums.get(v_indices[index2], 0)
+                                         + x)
 
     return new_dict
  
@@ -561,12 +919,12 @@ def print_two_indices_dict(indices_dict):
     Print to screen a two level nested dictionary.
     """
     
-    for key, value in indices_dict.iteritems():
-        print "\n{0}".format(key)
+    for key, value in indices_dict.items():
+        print(f"\n{key}")
         print_dict(value)
 
 
-def get_linexp_by_index(index, model="", name="", variables=""):
+def get_linexp_by_index(index, model=None, name=None, variables=None):
     """
     Return a dictionary of index values to Gurobi linear expressions
     corresponding to the summation of variables that match the index 
@@ -575,28 +933,30 @@ def get_linexp_by_index(index, model="", name="", variables=""):
     Specifiy either model and name parameters or supply a list of variables.
     """
 
-    linexps = {}
-
     variables = variables_check(model, name, variables)
+    indices = _get_variables_indices(variables, model)
 
-    for v in variables:
+    # Group the variables first so that each expression
+    # is built in one go instead of one term at a time.
+    var_dict = defaultdict(list)
+    for v, v_indices in zip(variables, indices):
+        var_dict[v_indices[index]].append(v)
+
+    linexps = {value: gp.LinExpr([1.0]*len(index_vars), index_vars)
+               for value, index_vars in var_dict.items()}
 
-        value = get_variable_index_value(v, index)
-        
-        if value not in linexps:
-            linexps[value] = gp.LinExpr(v)
-        else:
-            linexps[value] += v
-    
     return linexps
 
 
-def print_constraints(constraints):
+def print_constraints(constraints, model=None):
     """
     Print constraints in an aesthetically pleasing way.
+
+    If a model is given the names are fetched from it in a single call.
     """
 
-    print "\n".join([c.constrName for c in constraints])
+    names = _get_attr_values("ConstrName", constraints, model)
+    sys.stdout.writelines(name + "\n" for name in names)
     
 
 def get_constraints_multiple(model, names_list, approx=False):
@@ -604,18 +964,19 @@ def get_constraints_multiple(model, names_list, approx=False):
     Return a list of constraints given by the constraint
     set names in names_list.
     """
-    
-    cons_list = []
-    for name in names_list:
-        cons_list.extend(get_constraints(model, name, approx))
 
-    return cons_list
+    return _get_sets_members(_get_constraint_set_index(model), names_list,
+                             approx)
 
 
-def filter_constraints(constraints, filter_values, exclude=False):
+def filter_constraints(constraints, filter_values, exclude=False, model=None):
     """
     Return a new list of constraints that match the filter values from 
     the given constraints list.
+
+    filter_values maps index numbers to the index values to match.
+    If a model is given, unparsed constraint names are fetched from it
+    in a single call.
     """
     
     if not constraints:
@@ -624,29 +985,18 @@ def filter_constraints(constraints, filter_values, exclude=False):
     if not filter_values:
         raise ValueError("Dictionary of filter values not given")
 
-    new_cons = []
-    for c in constraints:
-        add = True
-        for index, value in filter_values.iteritems():
-            key = get_constraint_index_value(c, index)
-            try:
-                key.replace('"', "")
-            except AttributeError:
-                pass
-            if key != value:
-                add = False
-                break
-        if add:
-            new_cons.append(c)
-    
-    if exclude:
-        # May want to add sorting by varName here
-        new_cons = [c for c in (set(constraints)-set(new_cons))]
+    get_values, match = _index_matcher(filter_values)
+    indices = _get_constraints_indices(constraints, model)
+
+    # Single pass over the constraints, keeping those whose match
+    # result differs from exclude, so no set difference is needed.
+    new_cons = [c for c, con_indices in zip(constraints, indices)
+                if (get_values(con_indices) == match) != exclude]
 
     return new_cons
 
 
-def get_constraints(model, name="", approx=False, filter_values={}, 
+def get_constraints(model, name=None, approx=False, filter_values=None, 
         exclude=False):
     """
     Return a list of constraints from the model
@@ -665,22 +1015,44 @@ def get_constraints(model, name="", approx=False, filter_values={},
     """
 
     if not name:
-        return model.getConstrs()
+        return _get_model_constraints(model)
 
-    constraints = []
-    if not approx:
-        constraints = [c for c in model.getConstrs() 
-                if c.constrName.split(CON_BRACKET_L)[0] == name]
-    else:
-        constraints = [c for c in model.getConstrs()
-                if name in c.constrName.split(CON_BRACKET_L)[0]]
+    constraints = _get_set_members(_get_constraint_set_index(model),
+                                   name, approx)
 
     if filter_values:
-        constraints = filter_constraints(constraints, filter_values, exclude)
+        constraints = filter_constraints(constraints, filter_values, exclude,
+                                         model)
 
     return constraints
 
 
+def _get_constraint_set_index(model):
+    """
+    Return a dictionary mapping the constraint set names of a model
+    to lists of their constraints.
+
+    The dictionary is built once and rebuilt only when the
+    number of constraints in the model changes or clear_cache is called.
+    """
+
+    def build():
+        constraints = _get_model_constraints(model)
+        names = _get_attr_values("ConstrName", constraints, model)
+
+        # The names are at hand, so fill the model's index cache too
+        parsed = _get_model_cached(_CON_INDICES_CACHE, model,
+                                   model.NumConstrs, dict)
+        sets = defaultdict(list)
+        for c, con_name in zip(constraints, names):
+            set_name = con_name.partition(CON_BRACKET_L)[0]
+            sets[set_name].append(c)
+            parsed[id(c)] = (c, _parse_constraint_indices(con_name))
+        return dict(sets)
+
+    return _get_model_cached(_CON_SET_INDEX, model, model.NumConstrs, build)
+
+
 
 def constraints_check(model, name, constraints):
     """
@@ -689,18 +1061,21 @@ def constraints_check(model, name, constraints):
     from the model.
     """
     
-    if constraints:
+    if constraints is not None:
+        if not isinstance(constraints, list):
+            constraints = list(constraints)
         return constraints
 
-    if model and name:
-        constraints = get_constraints(model, name)
-    elif model and not name:
-        constraints = model.getConstrs()
+    if model is None:
+        raise ValueError("No model or constraints given")
 
-    return constraints
+    if name:
+        return get_constraints(model, name)
 
+    return _get_model_constraints(model)
 
-def get_constraints_attr(attr, model="", name="", constraints=""):
+
+def get_constraints_attr(attr, model=None, name=None, constraints=None):
     """
     Return a dictionary of constraint names and their
     corresponding attribute value. 
@@ -708,66 +1083,64 @@ def get_constraints_attr(attr, model="", name="", constraints=""):
     Specifiy either model and name parameters or supply a list of constraints
     """
 
-    if not attr:
-        raise AttributeError("No attributes specified")
-        
-    if not check_constraint_attr(attr):
-        raise AttributeError("{0}\n{1}\n{2}".format(
-        "Attribute: {0} not a constraint attribute.".format(attr),
-        "Get list of all variables attributes with the",
-        "get_constraint_attrs() method."))
+    _check_attr_given(attr, check_constraint_attr, "constraint")
 
     # Check if the attr supplied is not a viable model attribute
-    if not model and not constraints:
+    if model is None and constraints is None:
         raise ValueError("No model or constraint list given")
 
     constraints = constraints_check(model, name, constraints)
 
-    return {c.constrName: getattr(c, attr) for c in constraints}
+    names = _get_attr_values("ConstrName", constraints, model)
+    values = _get_attr_values(attr, constraints, model)
+
+    return dict(zip(names, values))
 
 
-def print_constraints_attr(attr, model="", name="", constraints=""):
+def print_constraints_attr(attr, model=None, name=None, constraints=None,
+                           sort=True):
     """
     Print to screen a list of constraint attribute values
     given by the constraints specified in the names parameter.
     
     Specifiy either model and name parameters or supply a list of constraints
-    
+
+    Set sort to False to skip sorting by constraint name.
     """
 
     constraints = get_constraints_attr(attr, model=model,
                                       name=name, constraints=constraints)
 
-    print "\n".join(["{0}, {1}".format(c, k) 
-                     for c, k in sorted(constraints.items())])
+    print_dict(constraints, sort=sort)
 
 
-def set_constraints_attr(attr, val, model="", name="", constraints=""):
+def set_constraints_attr(attr, val, model=None, name=None, constraints=None):
     """
     Set an attribute of a model constraint set.
 
-    Specifiy either model and name parameters or supply a list of constraints
+    Specifiy either model and name parameters or supply a list of constraints.
+    When renaming a list of constraints without the model, call
+    clear_cache(model) after model.update().
     """
 
-    if not attr or not val:
+    if val is None:
         raise AttributeError("No attribute or value specified")
-    
-    if not check_constraint_attr(attr):
-        raise AttributeError("{0}\n{1}\n{2}".format(
-        "Attribute: {0} not a variable attribute.".format(attr),
-        "Get list of all variables attributes with the",
-        "get_variable_attrs() method."))
 
-    if not model and not constraints:
+    _check_attr_given(attr, check_constraint_attr, "constraint")
+
+    if model is None and constraints is None:
         raise ValueError("No model or constraints specified")
     
     constraints = constraints_check(model, name, constraints)
 
-    for c in constraints:
-        setattr(c, attr, val)
+    _set_attr_values(attr, constraints, [val]*len(constraints), model)
+
+    if attr.lower() == "constrname" and model is not None:
+        # Cached set indices and index values are built from the names
+        _mark_renamed(model, attr, constraints, val)
 
 
-def set_constraints_rhs_as_percent(percent, model="", name="", constraints=""):
+def set_constraints_rhs_as_percent(percent, model=None, name=None, constraints=None):
     """
     Set the right hand side (rhs) of a constraint set as a percentage of its current rhs.
 
@@ -775,46 +1148,40 @@ def set_constraints_rhs_as_percent(percent, model="", name="", constraints=""):
     """
 
     if percent != 0 and not percent:
-        print "Error: No percent specified."
+        print("Error: No percent specified.")
         return
 
     try:
         percent = float(percent)
     except ValueError:
-        raise ValueError("Percent must be a number. Percent: {}".format(percent))
+        raise ValueError(f"Percent must be a number. Percent: {percent}")
 
-    if not model and not constraints:
+    if model is None and constraints is None:
         raise ValueError("No model or constraints specified.")
 
     constraints = constraints_check(model, name, constraints)
 
-    for c in constraints:
-        cur_rhs = getattr(c, "rhs")
-        setattr(c, "rhs", percent*cur_rhs)
+    cur_rhs = _get_attr_values("RHS", constraints, model)
+    _set_attr_values("RHS", constraints, [percent*rhs for rhs in cur_rhs],
+                     model)
 
 
-def remove_constraints_from_model(model, name="", constraints=""):
+def remove_constraints_from_model(model, name=None, constraints=None):
     """
     Remove the given constraints from the model.
 
     Specifiy either model and name parameters or supply a list of constraints 
     """
 
-
-    if not model and not constraints:
-        raise ValueError("No model or constraints given")
-
-    if not model:
+    if model is None:
         raise ValueError("No model given")
 
-    # This is needed for the case where a list of 
-    # constraints is provided because a model object 
-    # must be provided
-    if not constraints:
-        constraints = constraints_check(model, name, constraints)
+    constraints = constraints_check(model, name, constraints)
 
-    for c in constraints:
-        model.remove(c)
+    clear_cache(model)
+
+    # A single call removes the whole list
+    model.remove(list(constraints))
 
         
 def get_constraint_index_value(constraint, index):
@@ -826,24 +1193,44 @@ def get_constraint_index_value(constraint, index):
     as A(a,c,d, ....,f)
     """
 
-    value = constraint.constrName.split(",")[index].strip()
-    if CON_BRACKET_R in value:
-        value = value[:-1]
-    elif CON_BRACKET_L in value:
-        value = value.split(CON_BRACKET_L)[1]
-        
-    # Not expecting many constraint index values to
-    # to be floats
-    if value.isdigit:
-        try: 
-            value = int(value)
-        except ValueError:
-            pass
+    return _parse_constraint_indices(constraint.constrName)[index]
+
+
+def _get_constraints_indices(constraints, model=None):
+    """
+    Return a list of the index value tuples of the given constraints.
+
+    Without a model every name is read and parsed. With a model the
+    names not parsed yet are fetched in a single call and the tuples
+    are cached with the model's other cached data.
+    """
+
+    if model is None:
+        return [_parse_constraint_indices(c.constrName) for c in constraints]
+
+    # Each entry keeps its constraint alive, so an id() can not be
+    # reused by another constraint while the entry exists.
+    parsed = _get_model_cached(_CON_INDICES_CACHE, model, model.NumConstrs,
+                               dict)
+    missing = [c for c in constraints
+               if parsed.get(id(c), (None,))[0] is not c]
+    if missing:
+        names = _get_attr_values("ConstrName", missing, model)
+        for c, con_name in zip(missing, names):
+            parsed[id(c)] = (c, _parse_constraint_indices(con_name))
 
-    return value
+    return [parsed[id(c)][1] for c in constraints]
 
 
-def get_constraints_by_index(index, model="", name="", constraints=""):
+def _parse_constraint_indices(name):
+    """
+    Return a tuple of the index values in a constraint name.
+    """
+
+    return _parse_indices(name, CON_BRACKET_L, CON_BRACKET_R)
+
+
+def get_constraints_by_index(index, model=None, name=None, constraints=None):
     """
     Return a dictionary mapping index values to lists of
     constraints having that index value.
@@ -854,25 +1241,21 @@ def get_constraints_by_index(index, model="", name="", constraints=""):
     if index != 0 and not index:
         raise IndexError("No index given")
 
-    if not model and not constraints:
+    if model is None and constraints is None:
         raise ValueError("No model or constraints given")
     
-    if not (name and model) and not constraints:
+    if not (name and model is not None) and constraints is None:
         raise ValueError("No constraints specified")
 
     constraints = constraints_check(model, name, constraints)
+    indices = _get_constraints_indices(constraints, model)
 
-    con_dict = {}
-
-    for c in constraints:
+    con_dict = defaultdict(list)
 
-        value = get_constraint_index_value(c, index)
-        if value not in con_dict:
-            con_dict[value] = [c]
-        else:
-            con_dict[value].append(c)
+    for c, con_indices in zip(constraints, indices):
+        con_dict[con_indices[index]].append(c)
 
-    return con_dict
+    return dict(con_dict)
 
 
         
@@ -884,7 +1267,8 @@ def get_constraints_by_index_values(model, name, index_values, exclude=False):
     If exclude is True than return constraints that do not match the filters.
     """
     
-    constraints = get_constraints(model, name, index_values, exclude)
+    constraints = get_constraints(model, name, filter_values=index_values,
+                                  exclude=exclude)
     
     return constraints
 
@@ -923,10 +1307,20 @@ def add_constraint_constant(model, variables, constant, sense="<",
 
     sense = get_grb_sense_from_string(sense)
 
-    if not con_name:
-        model.addConstr(linexp, sense, constant)
-    else:
-        model.addConstr(linexp, sense, constant, con_name)
+    _add_linear_constraint(model, linexp, sense, constant, con_name)
+
+
+def _add_linear_constraint(model, linexp, sense, rhs, con_name=""):
+    """
+    Add a linear constraint to the model with a single call.
+
+    Uses Model.addLConstr where available (Gurobi 8 and later), which
+    skips the expression type checks of Model.addConstr.
+    """
+
+    add_constr = getattr(model, "addLConstr", None) or model.addConstr
+
+    add_constr(linexp, sense, rhs, con_name)
 
 
 def check_if_name_a_variable(name, model):
@@ -966,17 +1360,16 @@ def add_constraint_variables(model, variables1, variables2,
     """
 
     if not variables1 or not variables2:
-        ValueError("Variables list not provided")
+        raise ValueError("Variables list not provided")
 
-    linexp1 = get_linexp_from_variables(variables1)
-    linexp2 = get_linexp_from_variables(variables2)
+    # Move everything to the left hand side so the
+    # right hand side is a constant
+    linexp = (get_linexp_from_variables(variables1)
+              - get_linexp_from_variables(variables2))
 
     sense = get_grb_sense_from_string(sense)
 
-    if not con_name:
-        model.addConstr(linexp1, sense, linexp2)
-    else:
-        model.addConstr(linexp1, sense, linexp2, con_name)
+    _add_linear_constraint(model, linexp, sense, 0.0, con_name)
 
         
 def graph_by_index(model, variables, index, title="", y_axis="", x_axis=""):
@@ -984,22 +1377,29 @@ def graph_by_index(model, variables, index, title="", y_axis="", x_axis=""):
     Display a graph of the variable against the specified index
     using matplotlib. 
 
+    variables may be a list of variables or a Gurobi MVar.
+
     Matplotlib must already be installed to use this.
     See: http://matplotlib.org/faq/installing_faq.html
     """
     try:
         import matplotlib.pyplot as plot
     except ImportError:
-        raise ImportError("{0}\n{1}".format(
-        "Module Matplotlib not found.",
-        "Please download and install Matplotlib to use this function."))
+        raise ImportError(
+            "Module Matplotlib not found.\n"
+            "Please download and install Matplotlib to use this function.")
         
     fig = plot.figure()
     ax = fig.add_subplot(111)
 
-    variables_sum = sum_variables_by_index(index, variables=variables)
+    if _is_mvar(variables):
+        variables_sum = sum_variables_by_index_mvar(variables, index)
+    else:
+        variables_sum = sum_variables_by_index(index, model=model,
+                                               variables=variables)
 
-    keys, values = zip(*variables_sum.items())
+    # Bars are drawn at consecutive positions, so keep them in index order
+    keys, values = zip(*sorted(variables_sum.items(), key=itemgetter(0)))
 
     y = range(len(variables_sum))
     
@@ -1026,25 +1426,32 @@ def graph_by_two_indices(model, variables, index1, index2, title="",
     """
     try:
         import matplotlib.pyplot as plot
+        import numpy as np
     except ImportError:
-        raise ImportError("{0}\n{1}".format(
-        "Module Matplotlib not found.",
-        "Please download and install Matplotlib to use this function."))
+        raise ImportError(
+            "Module Matplotlib not found.\n"
+            "Please download and install Matplotlib to use this function.")
     
     fig = plot.figure()
     ax = fig.add_subplot(111)
     
     # We need to do this in reverse order to prepare it for graphing
-    variables_sum = sum_variables_by_two_indices(index2, index1, 
+    variables_sum = sum_variables_by_two_indices(index2, index1, model=model,
                                        variables=variables)
 
-    keys, values = zip(*variables_sum.items())
-    
-    colours = ["b", "g", "r", "c", "y", "m", "k", "w"]
+    keys = sorted(variables_sum)
+    inner_keys = sorted({k for value in variables_sum.values() for k in value})
 
+    # One row of bar heights per stack, aligned on the sorted inner keys
+    heights = np.array([[variables_sum[key].get(k, 0) for k in inner_keys]
+                        for key in keys], dtype=float)
+    # Each stack sits on the sum of the stacks before it
+    bottoms = np.cumsum(heights, axis=0) - heights
+    
+    # No white, it would be invisible on the default white background
+    colours = ["b", "g", "r", "c", "y", "m", "k"]
 
-    y = range(len(values[0]))
-    print y
+    y = range(len(inner_keys))
     
     if title:
         ax.set_title(title)
@@ -1054,77 +1461,162 @@ def graph_by_two_indices(model, variables, index1, index2, title="",
         ax.set_xlabel(x_axis)
     bars = []
     
-    prev_bars = [0 for bar in y]
-    colour_count = 0
-    for key, value in variables_sum.iteritems():
-        cur_bars = [k[1] for k in sorted(value.items(), key=lambda x: x[0])]
-        bars.append(ax.bar(y, cur_bars, bottom=prev_bars, 
-                                color=colours[colour_count]))
-        prev_bars = cur_bars
-        colour_count += 1
-        if colour_count == len(colours) - 1:
-            colour_count = 0
+    for i, (cur_bars, cur_bottoms) in enumerate(zip(heights, bottoms)):
+        bars.append(ax.bar(y, cur_bars, bottom=cur_bottoms, 
+                                color=colours[i % len(colours)]))
     ax.legend(keys)
 
     plot.show()
                          
 
-def print_variables_to_csv(file_name, model="", name="", variables=""):
+def print_variables_to_csv(file_name, model=None, name=None, variables=None,
+                           precision=None, attrs=None):
     """
     Print the specified variables to a csv file
     given by the file_name parameter.
 
     If no variables specified than all model
-    variables written.
+    variables written. If precision is given, values are
+    rounded to that many significant digits.
+
+    By default the solution value of each variable is written.
+    Give a list of variable attributes, e.g. ["X", "LB", "UB"],
+    in attrs to write one column per attribute instead.
     """
 
-    if ".csv" not in file_name:
+    if not file_name.lower().endswith(".csv"):
         raise ValueError("Non csv file specified")
 
-    with open(file_name, "wb+") as write_file:
+    if attrs is None:
+        headers = ["Variable name", "Value"]
+        attrs = ["X"]
+    else:
+        for attr in attrs:
+            _check_attr_given(attr, check_variable_attr, "variable")
+        headers = ["Variable name"] + list(attrs)
+
+    variables = variables_check(model, name, variables)
+
+    # One bulk fetch per column
+    columns = [_get_attr_values("VarName", variables, model)]
+    for attr in attrs:
+        values = _get_attr_values(attr, variables, model)
+        if precision is not None:
+            values = _round_values(values, precision)
+        columns.append(values)
+
+    _write_variables_csv(file_name, headers, columns)
+
+
+def print_many_to_csv(jobs, model=None):
+    """
+    Print several lists of variables to csv files.
+
+    jobs is an iterable of (file_name, variables) pairs. Values are
+    fetched from Gurobi one job at a time, since Gurobi models are
+    not thread safe. The files are then written from a small thread
+    pool, which only overlaps file I/O: csv formatting holds the GIL.
+    """
+
+    jobs = list(jobs)
+
+    for file_name, _ in jobs:
+        if not file_name.lower().endswith(".csv"):
+            raise ValueError("Non csv file specified")
+
+    fetched = []
+    for file_name, variables in jobs:
+        variables = variables_check(model, None, variables)
+        fetched.append((file_name, ["Variable name", "Value"],
+                        [_get_attr_values("VarName", variables, model),
+                         _get_attr_values("X", variables, model)]))
+
+    if not fetched:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(8, len(fetched))) as executor:
+        futures = [executor.submit(_write_variables_csv, *job)
+                   for job in fetched]
+
+    # Re-raise the first error from any of the writes
+    for future in futures:
+        future.result()
+
+
+def _write_variables_csv(file_name, headers, columns):
+    """
+    Write columns of variable names and attribute
+    values to a csv file.
+    """
+
+    with _open_for_export(file_name, "w", newline="") as write_file:
         writer = csv.writer(write_file)
 
-        headers = ["Variable name", "Value"]
         writer.writerow(headers)
 
-        variables = variables_check(model, name, variables) 
-        
         # This will put quotes around strings, because the variable
         # names have commas in them.
-        writer.writerows([ [v.varName, v.X] for v in variables])
+        writer.writerows(zip(*columns))
 
 
 def print_variables_to_csv_by_index(file_name, index, 
-                                    model="", name="", variables=""):
+                                    model=None, name=None, variables=None,
+                                    precision=None, sort=True):
     """
     Print the sums of variables by the specified index
     to a csv file.
 
     Default behaviour of the function is to overwrite
-    the given file_name.
+    the given file_name. If precision is given, sums are
+    rounded to that many significant digits.
+
+    Set sort to False to write the rows unsorted.
     """
 
-    if ".csv" not in file_name:
+    if not file_name.lower().endswith(".csv"):
         raise ValueError("Non csv file specified")
 
-    with open(file_name, "wb+") as write_file:
+    variables_dict = sum_variables_by_index(index, model=model,
+                                            name=name, variables=variables)
+
+    if not variables_dict:
+        raise ValueError("No variables found")
+
+    items = variables_dict.items()
+    if sort:
+        items = sorted(items, key=itemgetter(0))
+
+    if precision is not None:
+        # Round the sums column without unpacking every row
+        # into the arguments of a zip(*items) call.
+        items = zip(map(itemgetter(0), items),
+                    _round_values(map(itemgetter(1), items), precision))
+
+    with _open_for_export(file_name, "w", newline="") as write_file:
         writer = csv.writer(write_file)
 
         headers = ["Index", "Value"]
         writer.writerow(headers)
 
-        variables_dict = sum_variables_by_index(index, model=model,
-                                            name=name, variables=variables)
+        writer.writerows(items)
 
-        if not variables_dict:
-            raise ValueError("No variables found")
 
-        writer.writerows([ [key, value] 
-                        for key, value in sorted(variables_dict.items())])
+def _round_values(values, precision):
+    """
+    Return a list of values rounded to precision significant digits.
+
+    The results are still floats, so they are written with
+    the shortest representation of the rounded value. Values
+    that are not floats, such as variable types, are kept as is.
+    """
 
+    template = f"{{:.{precision}g}}"
+    return [float(template.format(value)) if isinstance(value, float)
+            else value for value in values]
 
-def print_variables_to_json_by_index(file_name, index, model="",
-                                    name="", variables="", index_alias=""):
+
+def print_variables_to_json_by_index(file_name, index, model=None,
+                                    name=None, variables=None, index_alias=""):
     """
     Print the specified variables to a json file given by file_name
     organized by the specified index.
@@ -1135,17 +1627,108 @@ def print_variables_to_json_by_index(file_name, index, model="",
     file_name's location.
     """
 
-    if ".json" not in file_name:
+    if not file_name.lower().endswith(".json"):
         raise ValueError("Non json file specified")
-        
+
     index_name = index
     if index_alias:
         index_name = index_alias
 
-    var_dict = sum_variables_by_index(index, model=model, 
+    var_dict = sum_variables_by_index(index, model=model,
                                       name=name, variables=variables)
 
-    data = {index_name: [{ index_name: var_dict }] }
+    # nvD3 expects the sums nested under the index name twice,
+    # with the keys in index order
+    var_dict = dict(sorted(var_dict.items(), key=itemgetter(0)))
+    data = {index_name: [{index_name: var_dict}]}
+
+    _dump_json(data, file_name)
+
 
-    json.dump(data, open(file_name, "wb"))
+def print_variables_to_ndjson_by_index(file_name, index, model=None,
+                                       name=None, variables=None):
+    """
+    Print the sums of variables by the specified index to a
+    newline delimited json file given by file_name.
+
+    Each line holds one index value and its sum, e.g.
+    {"index":"north","value":4.0}, sorted by index value, so
+    the file can be read a line at a time.
 
+    Default behaviour is to overwrite file if one exists in
+    file_name's location.
+    """
+
+    if not file_name.lower().endswith((".ndjson", ".jsonl")):
+        raise ValueError("Non ndjson file specified")
+
+    var_dict = sum_variables_by_index(index, model=model,
+                                      name=name, variables=variables)
+
+    if not var_dict:
+        raise ValueError("No variables found")
+
+    with _open_for_export(file_name, "w") as write_file:
+        write_file.writelines(
+            json.dumps({"index": key, "value": value},
+                       separators=(",", ":")) + "\n"
+            for key, value in sorted(var_dict.items(), key=itemgetter(0)))
+
+
+def _dump_json(data, file_name):
+    """
+    Write data to file_name as compact json.
+
+    Uses orjson when it is installed and the json module otherwise.
+    """
+
+    if orjson is not None:
+        with _open_for_export(file_name, "wb") as write_file:
+            write_file.write(orjson.dumps(data,
+                                          option=orjson.OPT_NON_STR_KEYS))
+        return
+
+    with _open_for_export(file_name, "w") as write_file:
+        # json.dumps encodes in one shot with the C encoder,
+        # json.dump would fall back to the pure Python one.
+        write_file.write(json.dumps(data, separators=(",", ":")))
+
+
+@contextmanager
+def _open_for_export(file_name, mode, **kwargs):
+    """
+    Open a temporary file next to file_name for writing and
+    move it into place once it has been written.
+
+    An export that fails part way leaves any existing file_name
+    untouched instead of a truncated file. Symlinks are written
+    through and an existing file keeps its mode, but it will be
+    owned by the user running the export.
+    """
+
+    # Write next to the file a symlink points at, not over the link
+    file_name = os.path.realpath(file_name)
+
+    # Unique per thread so concurrent exports of one file cannot collide.
+    # Opened by name rather than through tempfile so the umask applies,
+    # and no raw descriptor can leak if the file object cannot be made.
+    tmp_name = f"{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_name, mode, buffering=_WRITE_BUFFER_SIZE,
+                  **kwargs) as write_file:
+            yield write_file
+            # Make sure the data is on disk before the rename, or a
+            # crash could leave an empty file in place of the old one.
+            write_file.flush()
+            os.fsync(write_file.fileno())
+        try:
+            shutil.copymode(file_name, tmp_name)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_name, file_name)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
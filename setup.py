@@ -9,5 +9,5 @@ setup(
   url = 'https://github.com/AndrewBMartin/pygurobi', # use the URL to the github repo
   download_url = 'https://github.com/AndrewBMartin/pygurobi/tarball/0.4',
   keywords = ['operations research', 'optimization', 'interactive'], # arbitrary keywords
-  classifiers = [],
+  classifiers = ['Programming Language :: Python :: 3'],
 )
@@ -0,0 +1,149 @@
+"""
+Tests for the per-model caches behind the variable and constraint lookups.
+
+The models here are small stand-ins for gurobipy models: like Gurobi,
+they apply added, removed and renamed objects lazily on update().
+"""
+import gc
+import sys
+import types
+import unittest
+import weakref
+
+try:
+    import gurobipy
+except ImportError:
+    # The cache code never calls into gurobipy itself
+    sys.modules["gurobipy"] = types.ModuleType("gurobipy")
+
+from pygurobi import pygurobi as pg
+
+
+class Var(object):
+
+    def __init__(self, model, name):
+        # gurobipy variables hold a reference to their model
+        self.model = model
+        self.VarName = name
+        self.X = 1.0
+
+
+class Model(object):
+
+    def __init__(self, names=()):
+        self.vars = [Var(self, n) for n in names]
+        self.pending = []
+
+    @property
+    def NumVars(self):
+        return len(self.vars)
+
+    def getVars(self):
+        return list(self.vars)
+
+    def getAttr(self, attr, objects):
+        return [getattr(o, attr) for o in objects]
+
+    def setAttr(self, attr, objects, values):
+        for o, value in zip(objects, values):
+            self.pending.append(lambda o=o, value=value:
+                                setattr(o, attr, value))
+
+    def addVar(self, name):
+        var = Var(self, name)
+        self.pending.append(lambda: self.vars.append(var))
+        return var
+
+    def remove(self, objects):
+        for o in objects:
+            self.pending.append(lambda o=o: self.vars.remove(o))
+
+    def update(self):
+        for change in self.pending:
+            change()
+        self.pending = []
+
+
+class TestModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.model = Model(["x[1]", "x[2]", "y[1]"])
+
+    def names(self, name):
+        return [v.VarName for v in pg.get_variables(self.model, name)]
+
+    def test_added_variables_refresh_cache(self):
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]"])
+
+        self.model.addVar("x[3]")
+        self.model.update()
+
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]", "x[3]"])
+
+    def test_removed_variables_refresh_cache(self):
+        pg.remove_variables_from_model(self.model, "x")
+        self.model.update()
+
+        self.assertEqual(self.names("x"), [])
+        self.assertEqual(self.names("y"), ["y[1]"])
+
+    def test_rename_refreshes_cache(self):
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]"])
+
+        y = pg.get_variables(self.model, "y")
+        pg.set_variables_attr("VarName", "x[3]", model=self.model,
+                              variables=y)
+        self.model.update()
+
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]", "x[3]"])
+        self.assertEqual(pg.sum_variables_by_index(0, model=self.model,
+                                                   name="x"),
+                         {1: 1.0, 2: 1.0, 3: 1.0})
+
+    def test_lookup_before_update_of_rename(self):
+        y = pg.get_variables(self.model, "y")
+        pg.set_variables_attr("VarName", "x[3]", model=self.model,
+                              variables=y)
+
+        # Gurobi reports the old names until the model is updated
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]"])
+        self.assertEqual(self.names("y"), ["y[1]"])
+
+        self.model.update()
+
+        self.assertEqual(self.names("x"), ["x[1]", "x[2]", "x[3]"])
+        self.assertEqual(self.names("y"), [])
+
+    def test_clear_cache_after_update_of_rename(self):
+        x = pg.get_variables(self.model, "x")
+        pg.set_variables_attr("VarName", "z[1]", variables=x[:1])
+        self.model.update()
+
+        pg.clear_cache(self.model)
+        self.assertEqual(self.names("z"), ["z[1]"])
+        self.assertEqual(self.names("x"), ["x[2]"])
+
+    def test_clear_cache(self):
+        self.assertEqual(self.names("y"), ["y[1]"])
+
+        # Remove one variable and add one directly, keeping NumVars
+        self.model.remove(self.model.getVars()[:1])
+        self.model.addVar("y[2]")
+        self.model.update()
+        self.assertEqual(self.names("y"), ["y[1]"])
+
+        pg.clear_cache(self.model)
+        self.assertEqual(self.names("y"), ["y[1]", "y[2]"])
+
+    def test_cache_does_not_keep_model_alive(self):
+        pg.get_variables_by_index(0, model=self.model, name="x")
+        model_ref = weakref.ref(self.model)
+
+        del self.model
+        gc.collect()
+
+        self.assertIsNone(model_ref())
+
+
+if __name__ == "__main__":
+    unittest.main()